@@ -0,0 +1,331 @@
+"""Lightweight conversion of reStructuredText files to (MyST) Markdown.
+
+Only the subset of reStructuredText usually found in the files generated by PyScaffold
+(and in the ones users typically write on top of them) is supported: section titles,
+bullet/enumerated lists, literal and code blocks, hyperlinks and targets, footnotes,
+comments, roles and directives. Anything else is kept as it is.
+
+Substitution definitions cannot be applied to the references preceding them without
+reading the whole document, so substitution references are replaced by their names
+(or by links, for ``|name|_``) and the definitions are kept as comments.
+
+
+The document is processed as a stream of lines, block by block, without building a
+docutils tree. Therefore memory usage is bounded by the size of the largest block
+(paragraph or directive), not by the size of the document.
+"""
+import os
+import re
+from itertools import count
+from typing import Callable, Iterable, Iterator, List, Match, Optional, Tuple, Union
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+_RULE = re.compile(r"^([!-/:-@\[-`{-~])\1+$")
+_BULLET = re.compile(r"^(\s*)([-*+]|#\.|\d+[.)])\s+")
+_DIRECTIVE = re.compile(r"^\.\.\s+([\w:.+-]+)::(?:\s+(.*))?$")
+_SUBSTITUTION = re.compile(r"^\.\.\s+\|[^|]+\|\s+[\w:.+-]+::")
+_TARGET = re.compile(r"^\.\.\s+_(`[^`]+`|[^:]+):(?:\s+(.*))?$")
+_FOOTNOTE = re.compile(r"^\.\.\s+\[(#?[\w-]*)\](?:\s+(.*))?$")
+_OPTION = re.compile(r"^:([\w-]+):(?:\s+(.*))?$")
+_ANONYMOUS_TARGET = re.compile(r"^(?:\.\.\s+__:|__)(?:\s+(.*))?$")
+
+_CODE_DIRECTIVES = ("code-block", "code", "sourcecode")
+_DOUBLE_DASH = re.compile(r"-(?=-)")
+
+_REFNAME = r"(?<![\w`\]\[/.-])([^\W_](?:[\w.+-]*[^\W_])?)"
+_SUBSTITUTION_REF = r"(?<![\w|])\|(\S(?:[^|\n]*\S)?)\|"
+_INLINE_LITERAL = re.compile(r"(``.+?``)", re.S)
+_INLINE = [
+    # roles: :role:`text` => {role}`text`
+    (re.compile(r":((?:[\w.+-]+:)*[\w.+-]+):`([^`]+)`"), r"{\1}`\2`"),
+    # standalone and embedded URIs: `<url>`_, `text <url>`_
+    (re.compile(r"`<([^`>]+)>`__?(?!\w)"), r"<\1>"),
+    (re.compile(r"`([^`<]*?)\s*<([^`>]+?)_>`__?(?!\w)"), r"[\1][\2]"),
+    (re.compile(r"`([^`<]*?)\s*<([^`>]+)>`__?(?!\w)"), r"[\1](\2)"),
+    # footnote references: [#name]_ => [^name]
+    (re.compile(r"\[#?([\w-]+)\]_(?!\w)"), r"[^\1]"),
+    # anonymous references: `text`__ and text__ => [text][__1] (numbered in order)
+    (re.compile(r"`([^`]+)`__(?!\w)"), None),
+    (re.compile(_REFNAME + r"__(?!\w)"), None),
+    # substitution references: |name|_ => [name] and |name| => name
+    (re.compile(_SUBSTITUTION_REF + r"_(?!\w)"), r"[\1]"),
+    (re.compile(_SUBSTITUTION_REF + r"(?![\w|])"), r"\1"),
+    # references: `text`_ and text_ => [text]
+    (re.compile(r"`([^`]+)`__?(?!\w)"), r"[\1]"),
+    (re.compile(_REFNAME + r"__?(?!\w)"), r"[\1]"),
+    # auto-numbered lists
+    (re.compile(r"^(\s*)#\.(?=\s)", re.M), r"\g<1>1."),
+]
+
+
+def rst_to_md(text: str, html_targets: bool = False) -> str:
+    """Convert the reStructuredText ``text`` into MyST Markdown
+    (see :obj:`convert` for ``html_targets``)
+    """
+    lines = convert(text.splitlines(), html_targets)
+    return "".join(f"{line}\n" for line in lines)
+
+
+def convert_file(
+    source: PathLike,
+    destination: PathLike,
+    encoding: str = "utf-8",
+    html_targets: bool = False,
+):
+    """Convert the reStructuredText ``source`` file into the Markdown ``destination``
+    (see :obj:`convert` for ``html_targets``).
+
+    Lines are streamed from one file to the other, so peak memory usage does not
+    depend on the size of the files, just on the size of the largest block (e.g. a
+    huge paragraph or directive).
+    """
+    with open(source, encoding=encoding) as src:
+        with open(destination, "w", encoding=encoding) as dest:
+            dest.writelines(f"{line}\n" for line in convert(src, html_targets))
+
+
+def convert(lines: Iterable[str], html_targets: bool = False) -> Iterator[str]:
+    """Lazily convert reStructuredText ``lines`` into MyST Markdown lines.
+
+    ``lines`` can be any iterable (e.g. an open file), trailing line breaks are
+    ignored and the produced lines do not include them.
+
+    Targets without URL (e.g. ``.. _label:``) become MyST targets (``(label)=``),
+    unless ``html_targets`` is true: then HTML anchors (``<a id="label"></a>``) are
+    used, since MyST targets are displayed verbatim by other renderers (e.g. in the
+    ``README.md`` used as long description in PyPI).
+    """
+    return _Converter(html_targets=html_targets).blocks(_Lines(lines))
+
+
+class _Lines:
+    """Iterator over (right-stripped) lines supporting look-ahead"""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = (line.rstrip() for line in lines)
+        self._buffer: List[str] = []
+
+    def __iter__(self) -> "_Lines":
+        return self
+
+    def __next__(self) -> str:
+        if self._buffer:
+            return self._buffer.pop()
+        return next(self._lines)
+
+    def peek(self) -> Optional[str]:
+        if not self._buffer:
+            line = next(self._lines, None)
+            if line is None:
+                return None
+            self._buffer.append(line)
+        return self._buffer[-1]
+
+    def push(self, line: str):
+        self._buffer.append(line)
+
+    def indented(self, indent: int) -> List[str]:
+        """Consume the block of lines indented more than ``indent``.
+        Blank lines are considered part of the block, except when trailing.
+        """
+        block = []
+        line = self.peek()
+        while line is not None and (not line or _indent(line) > indent):
+            block.append(next(self))
+            line = self.peek()
+        while block and not block[-1]:
+            self.push(block.pop())
+        return block
+
+
+class _Converter:
+    def __init__(self, parent: Optional["_Converter"] = None, html_targets=False):
+        self.styles: List[Tuple[str, bool]] = []  # order defines the heading level
+        self.html_targets: bool = parent.html_targets if parent else html_targets
+        # anonymous references and targets are matched by their order in the document
+        self.references: Iterator[int] = parent.references if parent else count(1)
+        self.targets: Iterator[int] = parent.targets if parent else count(1)
+
+    def blocks(self, lines: _Lines) -> Iterator[str]:
+        for line in lines:
+            if not line or line.strip() == "|":
+                yield ""  # empty line blocks just add vertical space
+            elif _RULE.match(line):
+                yield from self.rule(line, lines)
+            elif line.lstrip().startswith(".. ") or line.strip() == "..":
+                yield from self.explicit(line, lines)
+            elif _ANONYMOUS_TARGET.match(line.lstrip()):
+                yield from self.explicit(line, lines)
+            else:
+                yield from self.paragraph(line, lines)
+
+    def heading(self, title: str, rule: str, overline: bool) -> str:
+        style = (rule[0], overline)
+        if style not in self.styles:
+            self.styles.append(style)
+        return "#" * (self.styles.index(style) + 1) + " " + self.inline(title.strip())
+
+    def inline(self, text: str) -> str:
+        return _inline(text, self.anonymous)
+
+    def anonymous(self, match: Match) -> str:
+        return f"[{match[1]}][__{next(self.references)}]"
+
+    def rule(self, line: str, lines: _Lines) -> Iterator[str]:
+        title = lines.peek()
+        if title and not _RULE.match(title):
+            next(lines)
+            if lines.peek() == line:
+                next(lines)
+                yield self.heading(title, line, overline=True)
+                return
+            lines.push(title)
+        if len(line) >= 4 and not title:
+            yield "---"  # transition
+        else:
+            yield from self.paragraph(line, lines)
+
+    def paragraph(self, line: str, lines: _Lines) -> Iterator[str]:
+        underline = lines.peek()
+        if (
+            underline
+            and _indent(line) == 0
+            and _RULE.match(underline)
+            and len(underline) >= max(3, min(len(line), 4))
+        ):
+            yield self.heading(line, next(lines), overline=False)
+            return
+
+        paragraph = [line]
+        following = lines.peek()
+        while following and not following.lstrip().startswith(".. "):
+            paragraph.append(next(lines))
+            following = lines.peek()
+
+        indent = _indent(line)
+        literal = paragraph[-1].endswith("::")
+        if literal:
+            last = paragraph.pop()[:-2]
+            if last.strip():
+                paragraph.append(last.rstrip() + ("" if last.endswith(" ") else ":"))
+
+        if paragraph:
+            text = self.inline("\n".join(paragraph))
+            if indent >= 4 and not _BULLET.match(line):  # block quote
+                text = "\n".join("> " + p[indent:] for p in text.splitlines())
+            yield from text.splitlines()
+
+        # literal blocks are indented relative to the text, not to the list bullet
+        block = _dedent(lines.indented(_text_indent(line))) if literal else []
+        while block and not block[0]:
+            block.pop(0)
+        if block:
+            yield ""
+            yield from _fenced("", [], block, " " * _text_indent(line))
+
+    def explicit(self, line: str, lines: _Lines) -> Iterator[str]:
+        indent = _indent(line)
+        prefix = " " * indent
+        markup = line.strip()
+        block = _dedent(lines.indented(indent))
+
+        anonymous = _ANONYMOUS_TARGET.match(markup)
+        if anonymous:
+            url = "".join([anonymous[1] or "", *(b.strip() for b in block)])
+            yield prefix + f"[__{next(self.targets)}]: {url}"
+            return
+
+        target = _TARGET.match(markup)
+        if target:
+            name = target[1].strip("`")
+            url = "".join([target[2] or "", *(b.strip() for b in block)])
+            if url:
+                yield prefix + f"[{name}]: {url}"
+            else:
+                anchor = f'<a id="{name}"></a>' if self.html_targets else f"({name})="
+                yield prefix + anchor
+            return
+
+        footnote = _FOOTNOTE.match(markup)
+        if footnote:
+            name = footnote[1].lstrip("#") or "1"
+            text = self.inline("\n".join([footnote[2] or "", *block]).strip())
+            yield from _indented(prefix, f"[^{name}]: {text}".splitlines())
+            return
+
+        directive = _DIRECTIVE.match(markup)
+        if directive and not _SUBSTITUTION.match(markup):
+            yield from self.directive(directive[1], directive[2] or "", block, prefix)
+            return
+
+        # comments (and unsupported explicit markup)
+        comment = [markup[2:].strip(), *block] if len(markup) > 2 else block
+        # `--` would end the HTML comment early (e.g. `.. <-- start -->`)
+        comment = [_DOUBLE_DASH.sub("- ", line) for line in comment]
+        yield from _indented(prefix, ["<!--", *comment, "-->"])
+
+    def directive(
+        self, name: str, args: str, block: List[str], prefix: str
+    ) -> Iterator[str]:
+        options = []
+        while block and _OPTION.match(block[0]):
+            options.append(block.pop(0))
+        while block and not block[0]:
+            block.pop(0)
+
+        if name in _CODE_DIRECTIVES:
+            yield from _fenced(args, [], block, prefix)
+        elif name == "image" and not block:
+            opts = dict(_OPTION.match(opt).groups() for opt in options)  # type: ignore
+            image = f"![{opts.get('alt') or ''}]({args})"
+            target = opts.get("target")
+            yield prefix + (f"[{image}]({target})" if target else image)
+        else:
+            body = list(_Converter(self).blocks(_Lines(block)))
+            info = "{" + name + "} " + self.inline(args)
+            yield from _fenced(info, options, body, prefix)
+
+
+def _fenced(
+    info: str, options: List[str], body: List[str], prefix: str
+) -> Iterator[str]:
+    """Generate a MyST fenced block, long enough to contain nested fences"""
+    char = "~" if "`" in info else "`"  # backticks are not allowed in the info string
+    nested = (len(b) - len(b.lstrip(char)) for b in body if b.startswith(char * 3))
+    fence = char * max(3, max(nested, default=0) + 1)
+    block = [f"{fence}{info}".rstrip(), *options]
+    if options and body:
+        block.append("")
+    yield from _indented(prefix, [*block, *body, fence])
+
+
+def _inline(text: str, anonymous: Callable[[Match], str]) -> str:
+    parts = _INLINE_LITERAL.split(text)
+    for i, part in enumerate(parts):
+        if i % 2:  # inline literals
+            if "`" not in part[2:-2]:
+                parts[i] = part[1:-1]
+            continue
+        for regex, replacement in _INLINE:
+            part = regex.sub(replacement or anonymous, part)
+        parts[i] = part
+    return "".join(parts)
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _text_indent(line: str) -> int:
+    bullet = _BULLET.match(line)
+    return len(bullet[0]) if bullet else _indent(line)
+
+
+def _dedent(block: List[str]) -> List[str]:
+    indent = min((_indent(line) for line in block if line), default=0)
+    return [line[indent:] for line in block]
+
+
+def _indented(prefix: str, lines: Iterable[str]) -> Iterator[str]:
+    return (prefix + line if line else line for line in lines)
@@ -1,14 +1,27 @@
 """Extension that replaces reStructuredText by Markdown"""
-from functools import partial, reduce
+import json
+import logging
+import re
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from functools import lru_cache
+from importlib.util import find_spec
+from os.path import normpath
+from pathlib import Path, PurePath
+from string import Template
 from textwrap import dedent
-from typing import List
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
 
 from configupdater import ConfigUpdater, Option
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
 from pyscaffold.actions import Action, ActionParams, ScaffoldOpts, Structure
 from pyscaffold.extensions import Extension
 from pyscaffold.identification import dasherize
-from pyscaffold.operations import no_overwrite
-from pyscaffold.structure import merge, reify_leaf, reject
+from pyscaffold.log import logger
+from pyscaffold.operations import FileContents, FileOp, no_overwrite
+from pyscaffold.structure import Leaf, merge, reify_content, reify_leaf, resolve_leaf
 from pyscaffold.templates import get_template
 
 from . import templates
@@ -21,23 +34,138 @@ DESC_KEY = "long_description"
 TYPE_KEY = "long_description_content_type"
 
 DOC_REQUIREMENTS = ["myst-parser[linkify]"]
+INLINE_COMMENT = re.compile(r"\s+#")
+SOURCE_SUFFIX = re.compile(r"^source_suffix =.*$", re.M)
+MYST_TARGET = re.compile(r"^\([^()\s]+\)=$")
+REQUIREMENT_EXTRAS = re.compile(r"^(\s*[A-Za-z0-9][\w.-]*)(?:\[([^\]]*)\])?")
+PIP_OPTION = re.compile(r"\s+--?[a-zA-Z]")  # e.g. ``pkg==1 --hash=sha256:...``
+
+CONVERTIBLE = ["README", "AUTHORS", "CHANGELOG", "CONTRIBUTING"]
+"""Files in the project root whose contents are converted to Markdown on updates"""
+
+LONG_DESCRIPTION = "README"
+"""File in the project root used as long description (rendered as GFM by PyPI), so
+targets are converted to HTML anchors (see :obj:`~.conversion.convert`)
+"""
+
+UNNECESSARY = [
+    "README.rst",
+    "AUTHORS.rst",
+    "CHANGELOG.rst",
+    "CONTRIBUTING.rst",
+    "docs/index.rst",
+    "docs/readme.rst",
+    "docs/license.rst",
+    "docs/authors.rst",
+    "docs/changelog.rst",
+    "docs/contributing.rst",
+]
+"""rst files removed from the project structure (replaced by Markdown)"""
+
+MODIFIED = ["setup.cfg", "docs/conf.py", "docs/requirements.txt"]
+"""Files of the project structure modified by the extension"""
+
+DOC_STUBS = ["readme", "license", "authors", "changelog", "contributing"]
+"""Pages under ``docs/`` that just include files from the project root (replaced by
+the MyST equivalents generated by the extension, instead of converted)
+"""
+
+LARGE_FILE = 1024 * 1024
+"""Files bigger than this (in bytes) are converted while written, line by line"""
+
+
+@lru_cache(maxsize=None)
+def template(name: str) -> Template:
+    """Load the template ``name`` from :mod:`pyscaffoldext.markdown.templates`.
+
+    Templates are shipped with the package and never change during the lifetime of
+    the process, so they are read only once and then reused (use
+    ``template.cache_info()`` to inspect hits/misses and ``template.cache_clear()``
+    to force them to be read again, e.g. while editing the templates).
+    """
+    return get_template(name, relative_to=templates)
+
+
+@contextmanager
+def timed(step: str) -> Iterator[None]:
+    """Measure how long ``step`` takes (also usable as a decorator).
 
+    The result is logged as a JSON object, at the ``DEBUG`` level (e.g.
+    ``putup --very-verbose``), so it can be easily aggregated across runs.
+    Please notice templates are only rendered when PyScaffold writes the files.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        yield
+        return
 
-template = partial(get_template, relative_to=templates)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        event = {"extension": "markdown", "step": step, "seconds": round(elapsed, 6)}
+        logger.debug(json.dumps(event))
 
 
 class Markdown(Extension):
     """Replace reStructuredText by Markdown"""
 
+    def augment_cli(self, parser: ArgumentParser):
+        """Add the ``--markdown`` flag and the options that customise the extension.
+        See :obj:`pyscaffold.extension.Extension.augment_cli`.
+        """
+        super().augment_cli(parser)
+        parser.add_argument(
+            "--markdown-docs",
+            dest="markdown_docs",
+            action="store_true",
+            default=False,
+            help="when updating a project with --markdown, also convert the existing "
+            "rst pages under docs/ to Markdown",
+        )
+        return self
+
     def activate(self, actions: List[Action]) -> List[Action]:
         """Activate extension. See :obj:`pyscaffold.extension.Extension.activate`."""
         actions = self.register(actions, add_doc_requirements)
         return self.register(actions, replace_files, before="verify_project_dir")
 
 
+class ParsedConfig(ConfigUpdater):
+    """:obj:`~configupdater.ConfigUpdater` document that can be used directly as the
+    contents of a file in a PyScaffold structure (it is serialized only when the file
+    is written, see :obj:`pyscaffold.structure.reify_content`).
+
+    Extensions modifying ``setup.cfg`` can check if the contents are already an
+    instance of :obj:`~configupdater.ConfigUpdater` and edit it in place, instead of
+    parsing and serializing the whole file again.
+    """
+
+    def __call__(self, _opts: ScaffoldOpts) -> str:
+        return str(self)
+
+
+def parse_config(leaf: Leaf, opts: ScaffoldOpts) -> Tuple[ConfigUpdater, FileOp]:
+    """Similar to :obj:`pyscaffold.structure.reify_leaf`, but ensures the file contents
+    are a parsed :obj:`ConfigUpdater` document (reusing it when already parsed)
+    """
+    content, file_op = resolve_leaf(leaf)
+    if isinstance(content, ConfigUpdater):
+        return content, file_op
+
+    updater = ParsedConfig()
+    updater.read_string(reify_content(content, opts) or "")
+    return updater, file_op
+
+
 def add_long_desc(content: str) -> str:
     updater = ConfigUpdater()
     updater.read_string(content)
+    return str(set_long_desc(updater))
+
+
+def set_long_desc(updater: ConfigUpdater) -> ConfigUpdater:
+    """Use ``README.md`` as long description in the (parsed) ``setup.cfg``"""
     metadata = updater["metadata"]
 
     dash_key = dasherize(DESC_KEY)
@@ -54,20 +182,34 @@ def add_long_desc(content: str) -> str:
     else:
         long_desc.add_after.option(TYPE_KEY, long_desc_value)
 
-    return str(updater)
+    return updater
 
 
 def add_myst(original: str) -> str:
     """Change docs/conf.py to use MyST-Parser, enabling md files"""
     # add myst_parser extension and its own extensions configuration
-    content = original.splitlines()
     myst = '\n# Enable markdown\nextensions.append("myst_parser")\n'
     myst_extensions = template("myst_extensions").template  # raw string
-    j = next(i for i, line in enumerate(content) if line.startswith("source_suffix ="))
-    content[j] = 'source_suffix = [".rst", ".md"]'
-    content.insert(j - 1, myst)
-    content.insert(j, myst_extensions)
-    return "\n".join(content)
+    source_suffix = 'source_suffix = [".rst", ".md"]'
+    blocks = f"{myst}\n{myst_extensions}\n"
+
+    # The blocks are placed right before the line preceding `source_suffix = ...`,
+    # using a single scan and slicing (instead of splitting the file in lines)
+    end = len(original) - 1 if original.endswith("\n") else len(original)
+    match = SOURCE_SUFFIX.search(original)
+    if not match:  # append everything to the end
+        content = f"{original[:end]}\n" if original else ""
+        return content + blocks + source_suffix
+    previous = original.rfind("\n", 0, max(match.start() - 1, 0)) + 1
+    return "".join(
+        [
+            original[:previous],
+            blocks,
+            original[previous : match.start()],
+            source_suffix,
+            original[match.end() : end],
+        ]
+    )
 
 
 def default_myst_include(root_file: str) -> str:
@@ -86,6 +228,7 @@ def default_myst_include(root_file: str) -> str:
     return template_include.replace("{root_file}", root_file)
 
 
+@timed("add_doc_requirements")
 def add_doc_requirements(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     """In order to build the docs new requirements are necessary now.
 
@@ -98,81 +241,332 @@ def add_doc_requirements(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     """
     leaf = struct.get("docs", {}).get("requirements.txt")
     original, file_op = reify_leaf(leaf, opts)
-    contents = original or ""
-
-    missing = [req for req in DOC_REQUIREMENTS if req not in contents]
-    requirements = [*contents.splitlines(), *missing]
+    lines = (original or "").splitlines()
 
     # It is not trivial to sort the requirements because they include a comment header
-    j = (i for (i, line) in enumerate(requirements) if line and not is_commented(line))
+    j = (i for (i, line) in enumerate(lines) if line and not is_commented(line))
     comments_end = next(j, 0)  # first element of the iterator is a non commented line
-    comments = requirements[:comments_end]
-    sorted_requirements = sorted(requirements[comments_end:])
-
-    new_contents = "\n".join([*comments, *sorted_requirements]) + "\n"
+    comments, requirements = lines[:comments_end], lines[comments_end:]
+
+    # Requirements are compared by name, so existing pins/options are respected
+    # (only the missing extras are added to them).
+    # Entries can span several lines (e.g. ``pip-compile --generate-hashes`` output)
+    entries = requirement_entries(requirements)
+    existing = {requirement_name("\n".join(entry)): entry for entry in entries}
+    missing = []
+    for requirement in DOC_REQUIREMENTS:
+        entry = existing.get(requirement_name(requirement))
+        if entry:
+            entry[0] = add_extras(entry[0], Requirement(requirement).extras)
+        else:
+            missing.append([requirement])
+
+    requirements = [line for entry in sorted([*entries, *missing]) for line in entry]
+    new_contents = "\n".join([*comments, *requirements]) + "\n"
     # ^  pre-commit requires a new line at the end of the file
 
     files: Structure = {"docs": {"requirements.txt": (new_contents, file_op)}}
 
-    return merge(struct, files), opts
+    return replace(struct, [], files), opts
 
 
 # NOTE: Avoid renaming/removing replace_files.
 #       The dsproject extension depends on that name, any changes in the function
 #       signature here should be followed by a PR to that repository.
+@timed("replace_files")
 def replace_files(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     """Replace all rst files to proper md and activate Sphinx md.
     See :obj:`pyscaffold.actions.Action`
     """
     # Define new files
     NO_OVERWRITE = no_overwrite()
-    files: Structure = {
-        "README.md": (template("readme"), NO_OVERWRITE),
-        "AUTHORS.md": (template("authors"), NO_OVERWRITE),
-        "CHANGELOG.md": (template("changelog"), NO_OVERWRITE),
-        "CONTRIBUTING.md": (template("contributing"), NO_OVERWRITE),
+    files = new_files(NO_OVERWRITE)
+
+    # Convert the existing rst files when updating a project (README.rst, etc...).
+    # New projects just use the templates, since their rst files were not written yet
+    if opts.get("update"):
+        files = merge(files, convert_existing(opts, NO_OVERWRITE))
+
+    # Modify pre-existing files
+    with timed("replace_files:set_long_desc"):
+        setup_cfg, file_op = parse_config(struct["setup.cfg"], opts)
+        files["setup.cfg"] = (set_long_desc(setup_cfg), file_op)
+
+    with timed("replace_files:add_myst"):
+        content, file_op = reify_leaf(struct["docs"]["conf.py"], opts)
+        files["docs"]["conf.py"] = (add_myst(content), file_op)
+
+    # Remove all unnecessary .rst files from struct and add the new ones
+    with timed("replace_files:replace"):
+        return replace(struct, UNNECESSARY, files), opts
+
+
+def new_files(file_op: FileOp) -> Structure:
+    """Markdown files added by the extension (templates are not rendered yet)"""
+    return {
+        "README.md": (template("readme"), file_op),
+        "AUTHORS.md": (template("authors"), file_op),
+        "CHANGELOG.md": (template("changelog"), file_op),
+        "CONTRIBUTING.md": (template("contributing"), file_op),
         "docs": {
-            "index.md": (template("index"), NO_OVERWRITE),
-            "readme.md": (default_myst_include("README.md"), NO_OVERWRITE),
-            "license.md": (template("license"), NO_OVERWRITE),
-            "authors.md": (default_myst_include("AUTHORS.md"), NO_OVERWRITE),
-            "changelog.md": (default_myst_include("CHANGELOG.md"), NO_OVERWRITE),
-            "contributing.md": (default_myst_include("CONTRIBUTING.md"), NO_OVERWRITE),
+            "index.md": (template("index"), file_op),
+            "readme.md": (default_myst_include("README.md"), file_op),
+            "license.md": (template("license"), file_op),
+            "authors.md": (default_myst_include("AUTHORS.md"), file_op),
+            "changelog.md": (default_myst_include("CHANGELOG.md"), file_op),
+            "contributing.md": (default_myst_include("CONTRIBUTING.md"), file_op),
         },
     }
 
-    # TODO: Automatically convert RST to MD
-    #
-    # >>> content, file_op = reify_leaf(struct.get("CONTRIBUTING.rst"), opts)
-    # >>> md_content = rst_to_myst(content or "", **RST2MYST_OPTS).text
-    # >>> files["CONTRIBUTING.md"] = (md_content, file_op)
-    #
-    # Currently there is a problem in rst-to-myst, preventing automatic conversion:
-    # https://github.com/executablebooks/rst-to-myst/issues/33#issuecomment-922264030
 
-    # Modify pre-existing files
-    content, file_op = reify_leaf(struct["setup.cfg"], opts)
-    files["setup.cfg"] = (add_long_desc(content), file_op)
-
-    content, file_op = reify_leaf(struct["docs"]["conf.py"], opts)
-    files["docs"]["conf.py"] = (add_myst(content), file_op)
-
-    # Remove all unnecessary .rst files from struct
-    unnecessary = [
-        "README.rst",
-        "AUTHORS.rst",
-        "CHANGELOG.rst",
-        "CONTRIBUTING.rst",
-        "docs/index.rst",
-        "docs/readme.rst",
-        "docs/license.rst",
-        "docs/authors.rst",
-        "docs/changelog.rst",
-        "docs/contributing.rst",
-    ]
-    struct = reduce(reject, unnecessary, struct)
-
-    return merge(struct, files), opts
+@timed("convert_existing")
+def convert_existing(opts: ScaffoldOpts, file_op: FileOp) -> Structure:
+    """Convert the rst files (e.g. ``README.rst``) of an existing project to Markdown
+    (see :obj:`CONVERTIBLE` and :obj:`convert_docs`).
+    """
+    from .conversion import rst_to_md  # only needed for updates, avoid import cost
+
+    project_path = Path(opts.get("project_path", "."))
+    files: Structure = {}
+    converted: Dict[str, str] = {}  # pages converted in memory
+    for name in CONVERTIBLE:
+        rst_file = project_path / f"{name}.rst"
+        if not rst_file.exists():
+            continue
+        html_targets = name == LONG_DESCRIPTION
+        if rst_file.stat().st_size > LARGE_FILE:
+            # Avoid loading huge files (e.g. old CHANGELOGs) into memory
+            placeholder = f"<!-- converted from {rst_file.name} -->\n"
+            stream_op = no_overwrite(stream_conversion(rst_file, html_targets))
+            files[f"{name}.md"] = (placeholder, stream_op)
+        else:
+            rst = rst_file.read_text("utf-8")
+            converted[f"{name}.md"] = rst_to_md(rst, html_targets)
+            files[f"{name}.md"] = (converted[f"{name}.md"], file_op)
+
+    if opts.get("markdown_docs"):
+        files["docs"] = convert_docs(project_path / "docs", file_op)
+        converted.update((f"docs/{p}", leaf[0]) for p, leaf in _leaves(files["docs"]))
+
+    check_converted(converted, opts)
+    return files
+
+
+@timed("check_converted")
+def check_converted(pages: Dict[str, str], opts: ScaffoldOpts):
+    """Log a warning for each problem found by :mod:`~pyscaffoldext.markdown.validate`
+    in the ``pages`` converted from rst (contents indexed by path), that will be
+    written to the disk. The conversion is best effort, so it is never interrupted.
+    """
+    from .validate import check_docs, check_readme
+
+    project_path = Path(opts.get("project_path", "."))
+    generated = {path for path, _ in _leaves(new_files(no_overwrite()))}
+    written = {
+        path: content
+        for path, content in pages.items()
+        if opts.get("force") or not (project_path / path).exists()
+    }
+
+    def exists(path: str) -> bool:
+        return path in generated or (project_path / path).exists()
+
+    problems = check_docs(written, exists)
+    if "README.md" in written and find_spec("readme_renderer"):  # optional
+        problems += check_readme(written["README.md"])
+    for problem in problems:
+        logger.warning(f"Converted Markdown: {problem}")
+
+
+def stream_conversion(source: Path, html_targets: bool = False) -> FileOp:
+    """:obj:`~pyscaffold.operations.FileOp` that writes the Markdown version of the
+    rst ``source`` file, streaming the conversion instead of using the given contents
+    (so the memory usage does not depend on the size of the file).
+    """
+
+    def _stream_conversion(path: Path, _contents: FileContents, opts: ScaffoldOpts):
+        from .conversion import convert_file
+
+        if not opts.get("pretend"):
+            convert_file(source, path, html_targets=html_targets)
+        logger.report("convert", path)
+        return path
+
+    return _stream_conversion
+
+
+def convert_docs(docs_path: Path, file_op: FileOp) -> Structure:
+    """Convert the rst pages under ``docs_path`` to Markdown, returning the
+    corresponding structure (relative to ``docs_path``).
+
+    Pages that just include the files in the project root (e.g. ``docs/readme.rst``)
+    are skipped (``replace_files`` generates MyST equivalents for them), as well as
+    the automatically generated ones (``docs/api``, ``docs/_build``, ...).
+    The labels defined by the skipped pages (e.g. ``.. _authors:``, referenced by
+    PyScaffold's default ``docs/index.rst``) are added to their MyST equivalents.
+    The ``include`` directives pointing to converted pages are updated accordingly.
+    """
+    from .conversion import convert
+
+    pages = doc_pages(docs_path)
+    converted = {page.as_posix() for page in pages}
+
+    struct: Structure = {}
+    stubs = new_files(file_op)["docs"]
+    for name in DOC_STUBS:
+        rst_file = docs_path / f"{name}.rst"
+        if not rst_file.exists():
+            continue
+        with open(rst_file, encoding="utf-8") as file:
+            labels = [line for line in convert(file) if MYST_TARGET.match(line)]
+        if labels:
+            stub, _ = stubs[f"{name}.md"]
+            content = stub.template if isinstance(stub, Template) else stub
+            struct[f"{name}.md"] = ("\n".join([*labels, "", content]), file_op)
+
+    for page in pages:
+        with open(docs_path / page, encoding="utf-8") as file:
+            lines = _md_includes(convert(file), page, converted)
+            content = "".join(f"{line}\n" for line in lines)
+        parent = struct
+        for part in page.parts[:-1]:
+            parent = parent.setdefault(part, {})
+        parent[page.with_suffix(".md").name] = (content, file_op)
+
+    return struct
+
+
+def doc_pages(docs_path: Path) -> List[PurePath]:
+    """rst pages under ``docs_path`` converted by :obj:`convert_docs`
+    (relative to ``docs_path``)
+    """
+    pages: List[PurePath] = []
+    for path in sorted(docs_path.glob("**/*.rst")):
+        page = path.relative_to(docs_path)
+        generated = page.parts[0] == "api" or page.parts[0].startswith("_")
+        if not generated and page.with_suffix("").as_posix() not in DOC_STUBS:
+            pages.append(page)
+    return pages
+
+
+def _md_includes(lines: Iterable[str], page: PurePath, converted: Set[str]):
+    """Point ``include`` directives to the Markdown version of the converted pages"""
+    for line in lines:
+        directive, _, target = line.partition("{include} ")
+        if target.endswith(".rst") and set(directive.lstrip()) == {"`"}:
+            parent = PurePath() if target.startswith("/") else page.parent
+            if PurePath(normpath(parent / target.lstrip("/"))).as_posix() in converted:
+                line = line[:-4] + ".md"
+        yield line
+
+
+def _leaves(struct: Structure, prefix: str = "") -> Iterator[Tuple[str, Leaf]]:
+    """Files in ``struct`` (with POSIX paths relative to it)"""
+    for name, node in struct.items():
+        if isinstance(node, dict):
+            yield from _leaves(node, f"{prefix}{name}/")
+        else:
+            yield f"{prefix}{name}", node
+
+
+def replace(struct: Structure, removed: Iterable[str], added: Structure) -> Structure:
+    """Equivalent to ``merge(reduce(reject, removed, struct), added)``
+    (see :mod:`pyscaffold.structure`), but performed in a single pass.
+
+    The paths in ``removed`` are organised in a prefix tree, so only the directories
+    touched by ``removed`` or ``added`` are visited and copied. Differently from
+    :obj:`~pyscaffold.structure.merge`, the remaining nodes are not deep-copied, but
+    shared with ``struct`` and ``added``.
+    """
+    trie: dict = {}
+    for path in removed:
+        *parents, name = PurePath(path).parts
+        node = trie
+        for parent in parents:
+            if node.get(parent, {}) is None:  # an ancestor is already removed
+                break
+            node = node.setdefault(parent, {})
+        else:
+            node[name] = None
+    return _replace(struct, trie, added)
+
+
+def _replace(struct: Structure, removed: dict, added: Structure) -> Structure:
+    result: Structure = {}
+    for name, node in struct.items():
+        to_remove = removed.get(name, {})
+        if to_remove is None:
+            continue
+        new_node = added.get(name)
+        if isinstance(node, dict) and (to_remove or isinstance(new_node, dict)):
+            if new_node is None or isinstance(new_node, dict):
+                node = _replace(node, to_remove, new_node or {})
+            else:
+                node = new_node
+        elif name in added:
+            both_leaves = not isinstance(node, dict) and not isinstance(new_node, dict)
+            node = _merge_leaf(node, new_node) if both_leaves else new_node
+        result[name] = node
+
+    for name, new_node in added.items():
+        if name not in result and (name not in struct or removed.get(name, {}) is None):
+            result[name] = new_node
+
+    return result
+
+
+def _merge_leaf(old: Leaf, new: Leaf) -> Leaf:
+    """Same as :obj:`pyscaffold.structure.merge` for a single file"""
+    old = old if isinstance(old, (list, tuple)) else (old, None)
+    new = new if isinstance(new, (list, tuple)) else (new, None)
+    content = old[0] if new[0] is None else new[0]
+    file_op = old[1] if new[1] is None else new[1]
+    return content if file_op is None else (content, file_op)
+
+
+def requirement_entries(lines: List[str]) -> List[List[str]]:
+    """Group the lines of a ``requirements.txt`` file into entries, so continuation
+    lines (after a trailing ``\\``) and indented comments (e.g. ``# via ...``) stay
+    together with the requirement they belong to.
+    """
+    entries: List[List[str]] = []
+    for line in lines:
+        previous = entries[-1][-1] if entries else ""
+        if previous.endswith("\\") or (entries and line[:1].isspace() and line.strip()):
+            entries[-1].append(line)
+        else:
+            entries.append([line])
+    return entries
+
+
+def requirement_name(line: str) -> str:
+    """Normalised name of the requirement in a ``requirements.txt`` line (or the line
+    itself, when it is not a :pep:`508` requirement, e.g. ``-r other.txt``).
+
+    Continuation lines, comments and per-requirement options (e.g. ``--hash``) are
+    ignored.
+    """
+    text = " ".join(part.rstrip("\\") for part in line.splitlines())
+    text = PIP_OPTION.split(INLINE_COMMENT.split(text, 1)[0], 1)[0]
+    try:
+        return canonicalize_name(Requirement(text).name)
+    except InvalidRequirement:
+        return line.strip()
+
+
+def add_extras(line: str, extras: Iterable[str]) -> str:
+    """Add the ``extras`` missing in the requirement of a ``requirements.txt`` line,
+    keeping its version specifiers, markers, options and comments.
+    """
+    match = REQUIREMENT_EXTRAS.match(line)
+    if not match:
+        return line
+    current = [extra.strip() for extra in (match[2] or "").split(",") if extra.strip()]
+    known = {canonicalize_name(extra) for extra in current}
+    new = [extra for extra in sorted(extras) if canonicalize_name(extra) not in known]
+    if not new:
+        return line
+    return f"{match[1]}[{','.join(current + new)}]{line[match.end():]}"
 
 
 def is_commented(line):
@@ -0,0 +1,132 @@
+"""Hierarchical (Merkle) digests of the files generated by the Markdown extension.
+
+Digests computed for the files that the extension would generate (:obj:`fingerprint`)
+can be compared with the ones computed for the same paths in an existing working copy
+(:obj:`working_copy`). Since the digest of a directory depends on the digests of all
+its contents, :obj:`changed` can skip unchanged directories without visiting them.
+"""
+from hashlib import sha256
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Mapping, Union
+
+from pyscaffold.actions import ScaffoldOpts
+
+from .extension import CONVERTIBLE, LARGE_FILE, LONG_DESCRIPTION, MODIFIED
+from .plan import plan
+from .preview import preview
+
+Digests = Dict[str, str]
+"""Hex digests indexed by POSIX path relative to the project (the root is ``""``)"""
+
+
+def fingerprint(opts: ScaffoldOpts) -> Digests:
+    """Digests of the files added or modified by the Markdown extension (and of the
+    directories containing them), as they would be generated for ``opts``
+    (see :obj:`pyscaffold.api.create_project`). Nothing is written to the disk.
+
+    Large rst files (see :obj:`~pyscaffoldext.markdown.extension.LARGE_FILE`) are
+    converted line by line while hashed, so they are never loaded into memory.
+    """
+    files = preview(opts)  # files that would not be written are not included
+    paths = set(plan(opts).added) | set(MODIFIED)
+    digests = {path: _digest(files[path]) for path in paths if path in files}
+
+    # Large files are converted while written, so `preview` only has a placeholder
+    project_path = Path(opts.get("project_path", "."))
+    for name in CONVERTIBLE if opts.get("update") else []:
+        rst_file = project_path / f"{name}.rst"
+        streamed = rst_file.exists() and rst_file.stat().st_size > LARGE_FILE
+        if streamed and f"{name}.md" in digests:
+            html_targets = name == LONG_DESCRIPTION
+            digests[f"{name}.md"] = _conversion_digest(rst_file, html_targets)
+
+    return _with_directories(digests)
+
+
+def working_copy(project_path: Union[str, Path], paths: Iterable[str]) -> Digests:
+    """Digests of the given ``paths`` in the project located at ``project_path``
+    (and of the directories containing them). Files that do not exist are ignored.
+    """
+    project_path = Path(project_path)
+    files = {}
+    for path in paths:
+        file = project_path / path
+        if file.is_file():
+            files[path] = file.read_bytes()
+    return tree(files)
+
+
+def tree(files: Mapping[str, Union[str, bytes]]) -> Digests:
+    """Build a hash tree for ``files`` (contents indexed by POSIX path).
+
+    The digest of a file only depends on its contents (``str`` is encoded as UTF-8),
+    while the digest of a directory depends on the names and digests of its children.
+    """
+    return _with_directories({path: _digest(data) for path, data in files.items()})
+
+
+def changed(expected: Digests, actual: Digests) -> List[str]:
+    """Paths of the files whose digests differ between ``expected`` and ``actual``
+    (including the ones missing in ``actual``). Directories with the same digest
+    are skipped entirely.
+    """
+    dirs = {str(parent) for path in expected for parent in PurePosixPath(path).parents}
+    children = _children(path for path in expected if path and path not in dirs)
+    pending, result = [""], []
+    while pending:
+        path = pending.pop()
+        if expected.get(path) == actual.get(path):
+            continue
+        if path in children:
+            pending.extend(children[path])
+        else:
+            result.append(path)
+    return sorted(result)
+
+
+def _with_directories(digests: Digests) -> Digests:
+    """Add the digests of the directories to the ones of the files"""
+    children = _children(list(digests))
+    # Deepest directories first, so the digests of the children are already known
+    for directory in sorted(children, key=_depth, reverse=True):
+        names = sorted((PurePosixPath(p).name, digests[p]) for p in children[directory])
+        body = "".join(f"{name}\0{digest}\n" for name, digest in names)
+        digests[directory] = sha256(body.encode("utf-8")).hexdigest()
+    return digests
+
+
+def _children(paths: Iterable[str]) -> Dict[str, List[str]]:
+    """Map each directory (including the root) to its direct children"""
+    children: Dict[str, List[str]] = {"": []}
+    for path in paths:
+        child = PurePosixPath(path)
+        for parent in child.parents:
+            key = "" if parent.name == "" else str(parent)
+            known = key in children
+            children.setdefault(key, []).append(str(child))
+            if known:
+                break
+            child = parent
+    return children
+
+
+def _digest(content: Union[str, bytes]) -> str:
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    return sha256(data).hexdigest()
+
+
+def _conversion_digest(source: Path, html_targets: bool) -> str:
+    """Digest of the Markdown version of the rst ``source`` file, produced line by
+    line (the same way :obj:`~pyscaffoldext.markdown.conversion.convert_file` does)
+    """
+    from .conversion import convert
+
+    digest = sha256()
+    with open(source, encoding="utf-8") as file:
+        for line in convert(file, html_targets):
+            digest.update(f"{line}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _depth(directory: str) -> int:
+    return directory.count("/") + 1 if directory else 0
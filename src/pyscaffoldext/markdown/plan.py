@@ -0,0 +1,79 @@
+"""Compute the effect of the Markdown extension on a project, without running it"""
+from configparser import ConfigParser
+from pathlib import Path
+from typing import Iterator, List, NamedTuple
+
+from pyscaffold.actions import ScaffoldOpts, Structure
+from pyscaffold.operations import no_overwrite
+
+from .extension import MODIFIED, UNNECESSARY, Markdown, doc_pages, new_files
+
+
+class ChangePlan(NamedTuple):
+    """Files affected by the Markdown extension (POSIX paths relative to the project)"""
+
+    added: List[str]
+    """Markdown files that will be written"""
+    removed: List[str]
+    """Existing rst files that will no longer be generated (they are kept in disk)"""
+    modified: List[str]
+    """Existing files that will be changed"""
+
+
+NO_OVERWRITE = ["setup.cfg", "docs/requirements.txt"]
+"""Files in :obj:`~pyscaffoldext.markdown.extension.MODIFIED` that PyScaffold does not
+overwrite (``no_overwrite``), unless ``force`` is used. The extension keeps their file
+operations, so existing files are not changed either.
+"""
+
+
+def plan(opts: ScaffoldOpts) -> ChangePlan:
+    """Plan the changes performed by the Markdown extension in the project located
+    in ``opts["project_path"]``, considering the same options accepted by
+    :obj:`pyscaffold.api.create_project` (e.g. ``update``, ``force`` and
+    ``markdown_docs``).
+
+    No template is rendered and, apart from ``setup.cfg``, no file is read (just
+    checked for existence), which makes this function cheap enough to be called for
+    a large number of projects.
+    """
+    project_path = Path(opts.get("project_path", "."))
+    added = list(_paths(new_files(no_overwrite())))
+    if opts.get("update") and opts.get("markdown_docs"):
+        pages = doc_pages(project_path / "docs")
+        added += [f"docs/{page.with_suffix('.md').as_posix()}" for page in pages]
+
+    force = opts.get("force")
+    if not force:  # existing files are not overwritten
+        added = [path for path in added if not (project_path / path).exists()]
+
+    removed = [path for path in UNNECESSARY if (project_path / path).exists()]
+    modified = [
+        path
+        for path in MODIFIED
+        if (project_path / path).exists() and (force or path not in NO_OVERWRITE)
+    ]
+    if opts.get("update") and not force and _records_extension(project_path):
+        modified.insert(0, "setup.cfg")
+    return ChangePlan(sorted(set(added)), removed, modified)
+
+
+def _records_extension(project_path: Path) -> bool:
+    """Updates add the extension to the ``[pyscaffold]`` section of an existing
+    ``setup.cfg``, even when the file is not overwritten
+    """
+    setup_cfg = project_path / "setup.cfg"
+    if not setup_cfg.exists():
+        return False
+    cfg = ConfigParser()
+    cfg.read(setup_cfg, encoding="utf-8")
+    extensions = cfg.get("pyscaffold", "extensions", fallback="").split()
+    return Markdown().name not in extensions
+
+
+def _paths(struct: Structure, prefix: str = "") -> Iterator[str]:
+    for name, node in struct.items():
+        if isinstance(node, dict):
+            yield from _paths(node, f"{prefix}{name}/")
+        else:
+            yield f"{prefix}{name}"
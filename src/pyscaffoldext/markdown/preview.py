@@ -0,0 +1,52 @@
+"""Render the files of a project using the Markdown extension, without writing them"""
+from typing import Dict, List, Optional
+
+from pyscaffold import api
+from pyscaffold.actions import Action, ScaffoldOpts, Structure
+from pyscaffold.exceptions import ActionNotFound
+from pyscaffold.extensions import Extension
+
+from .extension import Markdown
+
+
+def preview(opts: Optional[ScaffoldOpts] = None, **kwargs) -> Dict[str, str]:
+    """Generate the contents of a project (e.g. ``README.md``, ``docs/conf.py``,
+    ``setup.cfg``) in memory, without touching the disk.
+
+    This function accepts the same arguments as :obj:`pyscaffold.api.create_project`
+    (the Markdown extension is automatically added). Internally, the project is
+    created with the ``pretend`` option, so existing files that would not be
+    overwritten (e.g. when using ``update``) are not included. Nothing is printed
+    to the standard output.
+
+    Returns:
+        dict: file contents indexed by path (POSIX-style, relative to the project)
+    """
+    opts = {**(opts or {}), **kwargs}
+    extensions = list(opts.get("extensions") or [])
+    if not any(isinstance(ext, Markdown) for ext in extensions):
+        extensions.append(Markdown())
+
+    extensions.append(_Silent())
+    struct, _ = api.create_project({**opts, "extensions": extensions, "pretend": True})
+    return dict(_flatten(struct))
+
+
+class _Silent(Extension):
+    """Do not print ``done!`` at the end (see :obj:`pyscaffold.actions.report_done`)"""
+
+    persist = False
+
+    def activate(self, actions: List[Action]) -> List[Action]:
+        try:
+            return self.unregister(actions, "report_done")
+        except ActionNotFound:  # e.g. already removed by another extension
+            return actions
+
+
+def _flatten(struct: Structure, prefix: str = ""):
+    for name, node in struct.items():
+        if isinstance(node, dict):
+            yield from _flatten(node, f"{prefix}{name}/")
+        elif node is not None:
+            yield f"{prefix}{name}", node
@@ -0,0 +1,214 @@
+"""Static checks for the generated Markdown files.
+
+These checks are a lightweight replacement for a Sphinx build (for the documentation
+pages) and for ``twine check`` (for the ``README.md`` used as long description).
+They are especially useful for the files converted from reStructuredText, whose
+contents are not known in advance.
+
+Problems are reported as human readable strings, prefixed by the path of the file.
+"""
+import re
+import warnings
+from hashlib import sha256
+from pathlib import PurePosixPath
+from posixpath import normpath
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+_FENCE = re.compile(r"^\s*(`{3,}|~{3,})(.*)$")
+_INCLUDE = re.compile(r"^\s*(`{3,}|~{3,})\{include\}\s+(\S+)\s*$")
+_OPTION = re.compile(r"^\s*:([\w-]+):(?:\s+(.*))?$")
+_TOCTREE = re.compile(r"^\s*(`{3,}|~{3,})\{toctree\}")
+_HEADING = re.compile(r"^(#+)([ \t]+\S|[^#\s]).*$", re.M)
+_DEFINITION = re.compile(r"^\s{0,3}\[([^\]]+)\]:", re.M)
+_FULL_REFERENCE = re.compile(r"(?<![\]!\\])\[([^\]]+)\]\[([^\]]*)\]")
+_SHORT_REFERENCE = re.compile(r"(?<![\]!\\])\[([^\]]+)\](?![(\[:])")
+_INLINE_CODE = re.compile(r"(`+)[^`].*?\1", re.S)
+
+_README_CACHE: Dict[Tuple[str, str], List[str]] = {}
+
+
+def check_docs(
+    files: Mapping[str, str], exists: Optional[Callable[[str], bool]] = None
+) -> List[str]:
+    """Check the Markdown ``files`` (contents indexed by POSIX path relative to the
+    project root), similarly to what a Sphinx build would do:
+
+    - ``{include}`` directives point to existing files, and includes from outside
+      ``docs/`` use ``:relative-docs:`` and ``:relative-images:``.
+    - ``{toctree}`` entries point to existing pages.
+    - Headings are well formed and do not skip levels.
+    - Reference-style links are defined.
+
+    Paths that are not in ``files`` (e.g. pages that already exist in the disk) are
+    checked with the ``exists`` function (by default, they are considered missing).
+    """
+
+    def _exists(path: str) -> bool:
+        return path in files or bool(exists and exists(path))
+
+    problems = []
+    for path, content in files.items():
+        if path.endswith(".md"):
+            problems += [f"{path}: {m}" for m in _check_page(path, content, _exists)]
+    return problems
+
+
+def check_readme(content: str, variant: str = "GFM") -> List[str]:
+    """Check if ``content`` renders well as the long description of the package
+    in PyPI (with the given Markdown ``variant``), similarly to ``twine check``.
+
+    Besides rendering errors, MyST specific syntax (directives, roles and targets,
+    that are not supported by PyPI) and undefined links are reported.
+    Results are cached by content hash, so repeated checks are cheap.
+
+    Note:
+        Requires ``readme-renderer[md]`` (which is also used by ``twine``).
+        Without the Markdown support, no problems are reported.
+    """
+    key = (sha256(content.encode("utf-8")).hexdigest(), variant)
+    if key not in _README_CACHE:
+        problems = dict.fromkeys(_check_html(content, variant))  # unique, ordered
+        _README_CACHE[key] = [f"README.md: {msg}" for msg in problems]
+    return list(_README_CACHE[key])
+
+
+def _check_page(path: str, content: str, exists: Callable[[str], bool]):
+    parent = PurePosixPath(path).parent
+    yield from _check_includes(content, parent, exists)
+    if parent.parts[:1] == ("docs",):
+        yield from _check_toctrees(content, parent, exists)
+    text = _without_code(content)
+    yield from _check_headings(text)
+    yield from _check_links(text)
+
+
+def _check_includes(content: str, parent: PurePosixPath, exists) -> Iterator[str]:
+    lines = content.splitlines()
+    for i, line in enumerate(lines):
+        include = _INCLUDE.match(line)
+        if not include:
+            continue
+        target = include[2]
+        base = PurePosixPath("docs") if target.startswith("/") else parent
+        resolved = normpath(base / target.lstrip("/"))
+        if resolved.startswith("../") or not exists(resolved):
+            yield f"included file {target} not found"
+        options = _options(lines[i + 1 :])
+        outside = not resolved.startswith("docs/")
+        if outside and not {"relative-docs", "relative-images"} <= set(options):
+            yield f"{target} included without :relative-docs: or :relative-images:"
+
+
+def _check_toctrees(content: str, parent: PurePosixPath, exists) -> Iterator[str]:
+    lines = content.splitlines()
+    for i, line in enumerate(lines):
+        toctree = _TOCTREE.match(line)
+        if not toctree:
+            continue
+        options = _options(lines[i + 1 :])
+        for entry in _block(lines[i + 1 :], toctree[1]):
+            entry = entry.strip()
+            if not entry or _OPTION.match(entry):
+                continue
+            name = re.match(r"(?:.*<)?([^<>]+?)>?$", entry)[1]  # type: ignore
+            if "glob" in options and any(c in name for c in "*?["):
+                continue
+            if name == "self" or "://" in name or name.startswith("api/"):
+                continue  # api docs are generated by sphinx-apidoc during the build
+            base = PurePosixPath("docs") if name.startswith("/") else parent
+            page = normpath(base / name.lstrip("/"))
+            if not any(exists(f"{page}{suffix}") for suffix in (".md", ".rst")):
+                yield f"toctree entry {name} not found"
+
+
+def _check_headings(text: str) -> Iterator[str]:
+    previous = 0
+    for heading in _HEADING.finditer(text):
+        level = len(heading[1])
+        if not heading[2][0].isspace():
+            yield f"malformed heading {heading[0].strip()!r}"
+        elif previous and level > previous + 1:
+            yield f"heading level skipped: {heading[0].strip()!r}"
+        previous = level
+
+
+def _check_links(text: str) -> Iterator[str]:
+    labels = {_label(label) for label in _DEFINITION.findall(text)}
+    references = [b or a for a, b in _FULL_REFERENCE.findall(text)]
+    text = _FULL_REFERENCE.sub("", _DEFINITION.sub("", text))
+    references += _SHORT_REFERENCE.findall(text)
+    for ref in references:
+        ignored = ref.strip() in ("", "x", "X") or ref.startswith("^")
+        if not ignored and _label(ref) not in labels:
+            yield f"undefined link [{ref}]"
+
+
+def _check_html(content: str, variant: str) -> Iterator[str]:
+    with warnings.catch_warnings():  # emitted when ``[md]`` is not installed
+        warnings.simplefilter("ignore")
+        from readme_renderer.markdown import render, variants  # optional
+
+    if variant not in variants:
+        return  # the Markdown support of readme-renderer is not installed
+    html = render(content, variant=variant)
+    if not html:
+        yield f"cannot be rendered as {variant} Markdown"
+        return
+    for name in re.findall(r'(?:<pre lang|class)="(?:language-)?\{([^}"]+)\}"', html):
+        yield f"MyST directive {{{name}}} is displayed as a code block"
+    for name in re.findall(r"\{([\w:.+-]+)\}<code>", html):
+        yield f"MyST role {{{name}}} is displayed verbatim"
+    text = re.sub(r"<pre.*?</pre>|<code>.*?</code>", "", html, flags=re.S)
+    for label in re.findall(r"^(?:<p>)?\(([^()\s<>]+)\)=(?:</p>)?$", text, re.M):
+        yield f"MyST target ({label})= is displayed verbatim"
+    for ref in re.findall(r"\[([^\]<>]+)\](?!\()", text):
+        if ref.strip() not in ("", "x", "X"):
+            yield f"undefined link [{ref}]"
+    if "--&gt;" in text:
+        yield "unbalanced HTML comment (stray -->)"
+
+
+def _without_code(content: str) -> str:
+    """Remove fenced code blocks (but not the contents of MyST directives)
+    and inline code
+    """
+    lines: List[str] = []
+    code, directives = None, []
+    for line in content.splitlines():
+        fence = _FENCE.match(line)
+        if code:
+            code = None if fence and fence[1] == code and not fence[2] else code
+        elif fence and fence[2].startswith("{"):
+            directives.append(fence[1])
+        elif fence and directives and fence[1] == directives[-1] and not fence[2]:
+            directives.pop()
+        elif fence:
+            code = fence[1]
+        else:
+            lines.append(line)
+    return _INLINE_CODE.sub("", "\n".join(lines))
+
+
+def _options(lines: List[str]) -> List[str]:
+    """Names of the options at the beginning of a MyST directive block"""
+    options = []
+    for line in lines:
+        option = _OPTION.match(line)
+        if not option:
+            break
+        options.append(option[1])
+    return options
+
+
+def _block(lines: List[str], fence: str) -> List[str]:
+    """Lines of a MyST directive block, until the closing ``fence``"""
+    block = []
+    for line in lines:
+        if line.strip() == fence:
+            break
+        block.append(line)
+    return block
+
+
+def _label(label: str) -> str:
+    return " ".join(label.split()).lower()
@@ -0,0 +1,139 @@
+"""Benchmarks for the actions of the extension, using synthetic inputs of growing size.
+
+These tests require ``pytest-benchmark`` and are deselected by default.
+Please use ``tox -e benchmark`` to run them and store the results, and
+``tox -e benchmark-compare`` to fail when they get slower than the last stored run
+(as done in CI, see ``.cirrus.yml``). End-to-end benchmarks (marked as ``system``)
+depend too much on the disk and subprocesses to be compared reliably, so they are
+not part of the comparison.
+"""
+from functools import reduce
+from itertools import count
+
+import pytest
+from pyscaffold import __version__ as pyscaffold_version
+from pyscaffold import api
+from pyscaffold.operations import create
+from pyscaffold.structure import merge, reject
+
+from pyscaffoldext.markdown.extension import (
+    UNNECESSARY,
+    Markdown,
+    add_doc_requirements,
+    add_long_desc,
+    add_myst,
+    default_myst_include,
+    new_files,
+    replace,
+    replace_files,
+    template,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = [10, 100, 1000]
+
+
+def setup_cfg(size):
+    options = "\n".join(f"option{i} = value{i}" for i in range(size))
+    return f"[metadata]\nname = pkg\n{options}\n\n[options]\n{options}\n"
+
+
+def conf_py(size):
+    lines = [f"variable{i} = {i}" for i in range(size)]
+    lines.insert(size // 2, 'source_suffix = ".rst"')
+    return "\n".join(["extensions = []", *lines])
+
+
+def requirements(size):
+    return "# Requirements file\n" + "\n".join(f"package{i}>={i}" for i in range(size))
+
+
+def structure(size):
+    return {
+        "setup.cfg": (setup_cfg(size), create),
+        "README.rst": ("Title\n=====\n", create),
+        "src": {"pkg": {f"module{i}.py": ("", create) for i in range(size)}},
+        "docs": {
+            "conf.py": (conf_py(size), create),
+            "index.rst": ("", create),
+            "requirements.txt": (requirements(size), create),
+            **{f"page{i}.rst": ("", create) for i in range(size)},
+        },
+    }
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_add_long_desc(benchmark, size):
+    benchmark(add_long_desc, setup_cfg(size))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_add_myst(benchmark, size):
+    benchmark(add_myst, conf_py(size))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_insert_and_replace(benchmark, size):
+    # Baseline for `test_add_myst`: previous implementation, using `list.insert`
+    def add_myst_baseline(original):
+        content = original.splitlines()
+        myst = '\n# Enable markdown\nextensions.append("myst_parser")\n'
+        myst_extensions = template("myst_extensions").template
+        lines = enumerate(content)
+        j = next(i for i, line in lines if line.startswith("source_suffix ="))
+        content[j] = 'source_suffix = [".rst", ".md"]'
+        content.insert(j - 1, myst)
+        content.insert(j, myst_extensions)
+        return "\n".join(content)
+
+    conf = conf_py(size)
+    assert add_myst_baseline(conf) == add_myst(conf)
+    benchmark(add_myst_baseline, conf)
+
+
+def test_default_myst_include(benchmark):
+    benchmark(default_myst_include, "README.md")
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_add_doc_requirements(benchmark, size):
+    benchmark(add_doc_requirements, structure(size), {})
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_replace_files(benchmark, size):
+    benchmark(replace_files, structure(size), {})
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_reject_and_merge(benchmark, size):
+    # Baseline for `test_replace`
+    struct, files = structure(size), new_files(create)
+    benchmark(lambda: merge(reduce(reject, UNNECESSARY, struct), files))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_replace(benchmark, size):
+    struct, files = structure(size), new_files(create)
+    benchmark(replace, struct, UNNECESSARY, files)
+
+
+@pytest.mark.slow
+@pytest.mark.system
+def test_create_project(benchmark, tmpfolder):
+    projects = count()
+
+    def create_project():
+        opts = dict(
+            project_path=f"proj{next(projects)}",
+            package="pkg",
+            version=pyscaffold_version,
+            extensions=[Markdown()],
+            config_files=api.NO_CONFIG,
+        )
+        api.create_project(opts)
+
+    benchmark.pedantic(create_project, rounds=5)
@@ -0,0 +1,297 @@
+import re
+import tracemalloc
+from textwrap import dedent
+
+import pytest
+from pyscaffold.templates import get_template
+
+from pyscaffoldext.markdown.conversion import convert, convert_file, rst_to_md
+
+
+def test_headings():
+    rst = """\
+    =====
+    Title
+    =====
+
+    Section
+    =======
+
+    Subsection
+    ----------
+
+    Other Section
+    =============
+    """
+    md = rst_to_md(dedent(rst))
+    assert md.splitlines() == [
+        "# Title",
+        "",
+        "## Section",
+        "",
+        "### Subsection",
+        "",
+        "## Other Section",
+    ]
+
+
+def test_inline_markup():
+    rst = (
+        "Use ``tox`` with :func:`my.func` and `docs <https://example.com>`_, "
+        "see git_ and `Some Site`_ [#note]_."
+    )
+    assert rst_to_md(rst) == (
+        "Use `tox` with {func}`my.func` and [docs](https://example.com), "
+        "see [git] and [Some Site] [^note].\n"
+    )
+    # literal contents should be preserved
+    assert rst_to_md("``git_ and :func:x``") == "`git_ and :func:x`\n"
+    assert rst_to_md("``a `b` c``") == "``a `b` c``\n"
+    # links can span multiple lines in the same paragraph
+    rst = "`Python Software\nFoundation`_"
+    assert rst_to_md(rst) == "[Python Software\nFoundation]\n"
+
+
+def test_lists():
+    rst = """\
+    - item 1
+    - item 2
+
+    #. first
+    #. second
+    """
+    assert rst_to_md(dedent(rst)).splitlines() == [
+        "- item 1",
+        "- item 2",
+        "",
+        "1. first",
+        "1. second",
+    ]
+    # literal blocks belong to the list item, but the following text is not part of it
+    rst = "#. Run::\n\n    pip install .\n\n   to install it.\n"
+    assert rst_to_md(rst).splitlines() == [
+        "1. Run:",
+        "",
+        "   ```",
+        "   pip install .",
+        "   ```",
+        "",
+        "   to install it.",
+    ]
+
+
+def test_literal_and_code_blocks():
+    rst = """\
+    Run this::
+
+        tox -e docs
+
+    Or this:
+
+    .. code-block:: python
+
+       import my_package
+
+    Last one
+
+    ::
+
+        $ make
+    """
+    assert rst_to_md(dedent(rst)).splitlines() == [
+        "Run this:",
+        "",
+        "```",
+        "tox -e docs",
+        "```",
+        "",
+        "Or this:",
+        "",
+        "```python",
+        "import my_package",
+        "```",
+        "",
+        "Last one",
+        "",
+        "",
+        "```",
+        "$ make",
+        "```",
+    ]
+
+
+def test_directives():
+    rst = """\
+    .. note:: This is important
+
+       .. code-block:: bash
+
+          ls
+
+    .. toctree::
+       :maxdepth: 2
+
+       readme
+
+    .. image:: https://example.com/badge.svg
+       :alt: Badge
+       :target: https://example.com
+    """
+    assert rst_to_md(dedent(rst)).splitlines() == [
+        "````{note} This is important",
+        "```bash",
+        "ls",
+        "```",
+        "````",
+        "",
+        "```{toctree}",
+        ":maxdepth: 2",
+        "",
+        "readme",
+        "```",
+        "",
+        "[![Badge](https://example.com/badge.svg)](https://example.com)",
+    ]
+    # backticks are not allowed in the info string of backtick fences
+    assert rst_to_md(".. note:: Use ``tox``").splitlines() == [
+        "~~~{note} Use `tox`",
+        "~~~",
+    ]
+
+
+def test_targets_footnotes_and_comments():
+    rst = """\
+    .. _label:
+
+    .. This is a comment
+       spanning 2 lines
+
+    .. [#note] Footnote text
+    .. _git: https://git-scm.com
+    """
+    assert rst_to_md(dedent(rst)).splitlines() == [
+        "(label)=",
+        "",
+        "<!--",
+        "This is a comment",
+        "spanning 2 lines",
+        "-->",
+        "",
+        "[^note]: Footnote text",
+        "[git]: https://git-scm.com",
+    ]
+    # HTML anchors can be used instead of MyST targets (e.g. for PyPI)
+    rst = ".. _label:\n\n.. note::\n\n   .. _nested:\n"
+    assert rst_to_md(rst, html_targets=True).splitlines() == [
+        '<a id="label"></a>',
+        "",
+        "```{note}",
+        '<a id="nested"></a>',
+        "```",
+    ]
+    # the comment should not be closed early
+    comment = rst_to_md(".. <-- start -->").splitlines()
+    assert comment == ["<!--", "<- - start - ->", "-->"]
+
+
+def test_substitutions_and_anonymous_links():
+    rst = """\
+    Use |tox|_ on |the service|, see `this page`__ and docs__.
+
+    .. |tox| replace:: ``tox``
+    .. _tox: https://tox.wiki
+    .. __: https://example.com/page
+
+    __ https://example.com/docs
+    """
+    assert rst_to_md(dedent(rst)).splitlines() == [
+        "Use [tox] on the service, see [this page][__1] and [docs][__2].",
+        "",
+        "<!--",
+        "|tox| replace:: ``tox``",
+        "-->",
+        "[tox]: https://tox.wiki",
+        "[__1]: https://example.com/page",
+        "",
+        "[__2]: https://example.com/docs",
+    ]
+    # grid tables are not substitution references
+    assert rst_to_md("| a | b |") == "| a | b |\n"
+
+
+def test_convert_contributing():
+    # Regression test with PyScaffold's own template, the most commonly converted file
+    rst = get_template("contributing").substitute(name="proj")
+    md = rst_to_md(rst)
+    code, text, fences = [], [], []  # fences: (marker, is code block)
+    for line in md.splitlines():
+        fence = re.match(r"^\s*(`{3,})(.*)$", line)
+        if fence and fences and fence[1] == fences[-1][0] and not fence[2]:
+            fences.pop()
+        elif fence:
+            fences.append((fence[1], not fence[2].startswith("{")))
+        else:
+            (code if any(c for _, c in fences) else text).append(line.strip())
+
+    assert "pip install -U pip setuptools -e ." in code
+    assert "tox -r -e docs" in code
+    paragraph = "to be able to import the package under development in the Python REPL."
+    assert paragraph in text
+    assert "Try running:" in text
+    assert "to record your changes in [git]." in text
+    assert md.count("```{todo}") == rst.count(".. todo::")
+    important = "````{important} Don't forget to add unit tests and documentation"
+    assert f"   {important} in case your" in md.splitlines()
+    assert "|tox|" not in md.replace("|tox| replace::", "")
+    for comment in re.findall(r"<!--\n(.*?)\n-->", md, re.S):
+        assert "--" not in comment
+
+
+def test_convert_is_lazy():
+    consumed = []
+
+    def lines():
+        for i in range(1000):
+            consumed.append(i)
+            yield f"Paragraph {i}"
+            yield ""
+
+    converted = convert(lines())
+    assert next(converted) == "Paragraph 0"
+    assert len(consumed) < 5
+
+
+@pytest.mark.slow
+def test_convert_file_memory(tmp_path):
+    section = dedent(
+        """\
+        Version {i}
+        ===========
+
+        - Feature added, see ``module.func`` and `docs <https://example.com>`_
+        - Fixed bug, see :issue:`{i}`
+
+        .. code-block:: python
+
+           print({i})
+
+        """
+    )
+    source = tmp_path / "CHANGELOG.rst"
+    with open(source, "w") as file:
+        for i in range(6000):
+            file.write(section.format(i=i))
+    assert source.stat().st_size > 1_000_000
+    destination = tmp_path / "CHANGELOG.md"
+
+    tracemalloc.start()
+    try:
+        convert_file(source, destination)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < 256 * 1024  # does not depend on the size of the file
+    with open(destination) as file:
+        assert next(file) == "# Version 0\n"
+    assert "## Version" not in destination.read_text()
@@ -0,0 +1,77 @@
+from pyscaffold import __version__ as pyscaffold_version
+from pyscaffold import api
+
+from pyscaffoldext.markdown.extension import LARGE_FILE, Markdown
+from pyscaffoldext.markdown.fingerprint import changed, fingerprint, tree, working_copy
+
+
+def test_tree():
+    digests = tree({"a/b/c.md": "c", "a/d.md": b"d", "e.md": "e"})
+    assert set(digests) == {"", "a", "a/b", "a/b/c.md", "a/d.md", "e.md"}
+    # file digests only depend on the contents
+    assert tree({"x.md": "c"})["x.md"] == digests["a/b/c.md"]
+    # directory digests depend on the names and contents of the children
+    renamed = tree({"a/b/x.md": "c", "a/d.md": "d", "e.md": "e"})
+    assert renamed["a/b"] != digests["a/b"]
+    assert renamed["a"] != digests["a"] and renamed[""] != digests[""]
+    assert tree({"e.md": "e", "a/d.md": "d", "a/b/c.md": "c"}) == digests
+
+
+def test_changed():
+    expected = tree({"a/b/c.md": "c", "a/d.md": "d", "e.md": "e"})
+    assert changed(expected, expected) == []
+    actual = tree({"a/b/c.md": "c", "a/d.md": "x"})
+    assert changed(expected, actual) == ["a/d.md", "e.md"]
+
+
+def test_fingerprint_working_copy(tmpfolder):
+    opts = dict(
+        project_path="proj",
+        package="pkg",
+        version=pyscaffold_version,
+        config_files=api.NO_CONFIG,
+    )
+    expected = fingerprint(opts)
+    assert not (tmpfolder / "proj").exists()
+    assert "README.md" in expected and "docs/conf.py" in expected
+    assert "src/pkg/__init__.py" not in expected  # not generated by the extension
+
+    # Given the project is generated with the same options
+    api.create_project(opts, extensions=[Markdown()])
+    paths = [path for path in expected if (tmpfolder / "proj" / path).is_file()]
+    actual = working_copy("proj", paths)
+    # then the digests of the working copy should match
+    assert changed(expected, actual) == []
+    assert actual[""] == expected[""]
+
+    # and local changes should be detected
+    (tmpfolder / "proj/docs/index.md").write_text("# Changed\n")
+    (tmpfolder / "proj/README.md").unlink()
+    actual = working_copy("proj", paths)
+    assert changed(expected, actual) == ["README.md", "docs/index.md"]
+
+
+def test_fingerprint_large_files(tmpfolder):
+    # Given an existing project with a large CHANGELOG.rst
+    opts = dict(
+        project_path="proj",
+        package="pkg",
+        version=pyscaffold_version,
+        config_files=api.NO_CONFIG,
+    )
+    api.create_project(opts)
+    changelog = tmpfolder / "proj/CHANGELOG.rst"
+    versions = (f"Version {i}\n{'=' * 20}\n\n- Fix bug #{i}\n\n" for i in range(20000))
+    changelog.write_text("=========\nChangelog\n=========\n\n" + "".join(versions))
+    assert changelog.stat().st_size > LARGE_FILE
+
+    # when the fingerprint is computed for an update
+    opts = {**opts, "update": True, "force": True, "extensions": [Markdown()]}
+    expected = fingerprint(opts)
+    assert not (tmpfolder / "proj/CHANGELOG.md").exists()
+
+    # then it should match the converted file, not a placeholder
+    api.create_project(opts)
+    actual = working_copy("proj", expected)
+    assert "CHANGELOG.md" in actual
+    assert changed(expected, actual) == []
@@ -1,11 +1,30 @@
+import json
+import sys
 from configparser import ConfigParser
+from functools import reduce
+from subprocess import check_output
 from textwrap import dedent
 
 import pytest
 from pyscaffold import __version__ as pyscaffold_version
 from pyscaffold import api, cli
+from pyscaffold.log import logger
+from pyscaffold.operations import create
+from pyscaffold.structure import merge, reify_leaf, reject
 
-from pyscaffoldext.markdown.extension import DOC_REQUIREMENTS, Markdown, add_long_desc
+from pyscaffoldext.markdown.extension import (
+    DOC_REQUIREMENTS,
+    LARGE_FILE,
+    Markdown,
+    ParsedConfig,
+    add_doc_requirements,
+    add_long_desc,
+    add_myst,
+    convert_existing,
+    replace,
+    replace_files,
+    template,
+)
 
 CONV_FILES = [
     "README",
@@ -56,6 +75,141 @@ def test_underscore_keys():
         assert "long-description-content-type" not in options
 
 
+def test_replace_files_reuses_parsed_setup_cfg():
+    # Given setup.cfg was already parsed by another extension
+    setup_cfg = ParsedConfig()
+    setup_cfg.read_string("[metadata]\nname = pkg\n")
+    struct = {
+        "setup.cfg": (setup_cfg, create),
+        "docs": {"conf.py": ('source_suffix = ".rst"', create)},
+    }
+
+    # when the files are replaced,
+    new_struct, _ = replace_files(struct, {})
+
+    # then the same document should be modified, and serialized only when reified
+    assert new_struct["setup.cfg"][0] is setup_cfg
+    content, _ = reify_leaf(new_struct["setup.cfg"], {})
+    cfg = ConfigParser()
+    cfg.read_string(content)
+    assert cfg["metadata"]["long_description"] == "file: README.md"
+
+
+def test_add_doc_requirements():
+    original = dedent(
+        """\
+        # Header comment
+        # myst-parser[linkify]
+        sphinx>=3.2.1
+        """
+    )
+    struct = {"docs": {"requirements.txt": (original, create)}}
+    new_struct, _ = add_doc_requirements(struct, {})
+    content, _ = reify_leaf(new_struct["docs"]["requirements.txt"], {})
+    assert content.splitlines() == [
+        "# Header comment",
+        "# myst-parser[linkify]",
+        "myst-parser[linkify]",
+        "sphinx>=3.2.1",
+    ]
+
+    # existing (e.g. pinned) requirements should be respected, adding missing extras
+    original = "Sphinx\nMyST_Parser[x]==0.15  # pinned\n-r other.txt\n"
+    struct = {"docs": {"requirements.txt": (original, create)}}
+    new_struct, _ = add_doc_requirements(struct, {})
+    content, _ = reify_leaf(new_struct["docs"]["requirements.txt"], {})
+    assert content.splitlines() == [
+        "-r other.txt",
+        "MyST_Parser[x,linkify]==0.15  # pinned",
+        "Sphinx",
+    ]
+
+    # requirements without the extras are not duplicated
+    for original in ("myst-parser\n", "myst_parser[Linkify]\n"):
+        struct = {"docs": {"requirements.txt": (original, create)}}
+        new_struct, _ = add_doc_requirements(struct, {})
+        content, _ = reify_leaf(new_struct["docs"]["requirements.txt"], {})
+        assert content == original.replace("myst-parser", "myst-parser[linkify]")
+
+    # pip options and continuation lines (e.g. pip-compile with hashes) are supported
+    original = dedent(
+        """\
+        # This file is autogenerated by pip-compile
+        sphinx==5.3.0 --hash=sha256:aaa
+        myst-parser==0.18.1 \\
+            --hash=sha256:bbb \\
+            --hash=sha256:ccc
+            # via -r requirements.in
+        docutils==0.19 \\
+            --hash=sha256:ddd
+        """
+    )
+    struct = {"docs": {"requirements.txt": (original, create)}}
+    new_struct, _ = add_doc_requirements(struct, {})
+    content, _ = reify_leaf(new_struct["docs"]["requirements.txt"], {})
+    assert content.splitlines() == [
+        "# This file is autogenerated by pip-compile",
+        "docutils==0.19 \\",
+        "    --hash=sha256:ddd",
+        "myst-parser[linkify]==0.18.1 \\",
+        "    --hash=sha256:bbb \\",
+        "    --hash=sha256:ccc",
+        "    # via -r requirements.in",
+        "sphinx==5.3.0 --hash=sha256:aaa",
+    ]
+
+
+def test_replace():
+    struct = {
+        "README.rst": ("old", create),
+        "setup.cfg": "[metadata]",
+        "src": {"pkg": {"__init__.py": ""}},
+        "docs": {"index.rst": "", "conf.py": ("", create), "api": {"x.rst": ""}},
+        "tests": "not a dir",
+    }
+    removed = ["README.rst", "docs/index.rst", "docs/api", "tests/x.py", "nope/x"]
+    added = {
+        "README.md": ("new", create),
+        "setup.cfg": (None, create),
+        "docs": {"conf.py": "modified", "index.md": ""},
+        "src": "not a dir anymore",
+    }
+    expected = merge(reduce(reject, removed, struct), added)
+    assert replace(struct, removed, added) == expected
+    assert list(replace(struct, removed, added)) == list(expected)  # same order
+    # and the original structure should not be modified
+    assert "README.rst" in struct and "index.rst" in struct["docs"]
+
+    # overlapping removals are accepted in any order
+    for removed in (["docs/api/x.rst", "docs"], ["docs", "docs/api/x.rst"]):
+        expected = merge(reduce(reject, removed, struct), added)
+        assert replace(struct, removed, added) == expected
+
+
+def test_add_myst():
+    original = dedent(
+        """\
+        extensions = []
+        templates_path = ["_templates"]
+        source_suffix = ".rst"
+        master_doc = "index"
+        """
+    )
+    lines = add_myst(original).splitlines()
+    assert 'extensions.append("myst_parser")' in lines
+    assert 'source_suffix = [".rst", ".md"]' in lines
+    assert 'source_suffix = ".rst"' not in lines
+    myst = lines.index('extensions.append("myst_parser")')
+    assert lines.index("extensions = []") < myst < lines.index('master_doc = "index"')
+
+    # when source_suffix is missing, the configuration should be appended
+    lines = add_myst("extensions = []").splitlines()
+    assert lines[0] == "extensions = []"
+    assert 'extensions.append("myst_parser")' in lines
+    assert lines[-1] == 'source_suffix = [".rst", ".md"]'
+    assert add_myst("").endswith('source_suffix = [".rst", ".md"]')
+
+
 @pytest.mark.slow
 def test_create_project_with_markdown(tmpfolder):
     # Given options with the markdown extension,
@@ -111,3 +265,129 @@ def test_cli_with_markdown_and_update(tmpfolder):
     for file in CONV_FILES:
         assert (tmpfolder / f"proj/{file}.md").exists()
         assert not (tmpfolder / f"proj/{file}.rst").exists()
+
+
+def test_templates_are_loaded_once():
+    template.cache_clear()
+    first = template("readme")
+    assert template("readme") is first
+    info = template.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+@pytest.mark.slow
+@pytest.mark.system
+def test_cli_update_converts_existing_rst_files(tmpfolder):
+    # Given a project exists without the markdown extension
+    opts = dict(
+        project_path="proj",
+        package="pkg",
+        version=pyscaffold_version,
+        config_files=api.NO_CONFIG,
+    )
+    api.create_project(opts)
+    readme = tmpfolder / "proj/README.rst"
+    readme.write_text("Title\n=====\n\n.. _intro:\n\nSome **custom** content.\n")
+    changelog = tmpfolder / "proj/CHANGELOG.rst"
+    versions = (f"Version {i}\n{'=' * 20}\n\n- Fix bug #{i}\n\n" for i in range(20000))
+    changelog.write_text("=========\nChangelog\n=========\n\n" + "".join(versions))
+    assert changelog.stat().st_size > LARGE_FILE
+
+    # when the project is updated with the markdown extension
+    args = ["--no-config", "--update", "--force", "--markdown", "proj"]
+    cli.main(args)
+
+    # then existing rst content should be converted instead of discarded
+    converted = (tmpfolder / "proj/README.md").read_text()
+    # (with HTML anchors, since MyST targets are not supported by PyPI)
+    assert converted == '# Title\n\n<a id="intro"></a>\n\nSome **custom** content.\n'
+    # (even when the files are large)
+    converted = (tmpfolder / "proj/CHANGELOG.md").read_text()
+    assert converted.startswith("# Changelog\n")
+    assert converted.count("## Version") == 20000
+    for file in CONV_FILES:
+        assert (tmpfolder / f"proj/{file}.md").exists()
+
+
+@pytest.mark.slow
+@pytest.mark.system
+def test_cli_update_converts_docs(tmpfolder):
+    # Given a project exists without the markdown extension, with extra doc pages
+    opts = dict(
+        project_path="proj",
+        package="pkg",
+        version=pyscaffold_version,
+        config_files=api.NO_CONFIG,
+    )
+    api.create_project(opts)
+    docs = tmpfolder / "proj/docs"
+    (docs / "guide.rst").write_text("Guide\n=====\n\nSome text.\n")
+    (docs / "topics").mkdir()
+    (docs / "topics/intro.rst").write_text(".. include:: ../guide.rst\n")
+
+    # when the project is updated with the markdown extension and --markdown-docs
+    args = ["--no-config", "--update", "--force", "--markdown", "--markdown-docs"]
+    cli.main([*args, "proj"])
+
+    # then all the doc pages should be converted, and includes point to md files
+    assert (docs / "guide.md").read_text() == "# Guide\n\nSome text.\n"
+    assert "```{include} ../guide.md" in (docs / "topics/intro.md").read_text()
+    assert "Overview <readme>" in (docs / "index.md").read_text()
+    assert "```{include} ../README.md" in (docs / "readme.md").read_text()
+    # and the labels defined by the skipped pages should be preserved
+    assert "{ref}`authors` and {ref}`changes`" in (docs / "index.md").read_text()
+    labels = {"readme": "readme", "authors": "authors", "changelog": "changes"}
+    for page, label in labels.items():
+        stub = (docs / f"{page}.md").read_text()
+        assert stub.startswith(f"({label})=\n\n```{{include}} ../")
+    assert (docs / "license.md").read_text().startswith("(license)=\n\n# License\n")
+    assert (docs / "contributing.md").read_text().startswith("```{include}")
+
+
+def test_convert_existing_checks_pages(tmpfolder, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(logger, "warning", warnings.append)
+    # Given a project with doc pages with (indented) includes and broken links
+    docs = tmpfolder / "proj/docs"
+    docs.mkdir(parents=True)
+    guide = "Guide\n=====\n\n#. Step:\n\n   .. include:: part.rst\n\nSee missing_.\n"
+    (docs / "guide.rst").write_text(guide)
+    (docs / "part.rst").write_text("Part\n====\n")
+
+    # when the pages are converted
+    files = convert_existing({"project_path": "proj", "markdown_docs": True}, create)
+
+    # then includes should point to the converted pages
+    assert "   ```{include} part.md" in files["docs"]["guide.md"][0].splitlines()
+    # and the problems in the converted pages should be reported
+    assert warnings == ["Converted Markdown: docs/guide.md: undefined link [missing]"]
+
+
+def test_convert_existing_checks_readme(tmpfolder, monkeypatch):
+    pytest.importorskip("readme_renderer.markdown")
+    warnings = []
+    monkeypatch.setattr(logger, "warning", warnings.append)
+    (tmpfolder / "proj").mkdir()
+    (tmpfolder / "proj/README.rst").write_text("Title\n=====\n\n.. note:: Hi\n")
+    convert_existing({"project_path": "proj"}, create)
+    message = "README.md: MyST directive {note} is displayed as a code block"
+    assert warnings == [f"Converted Markdown: {message}"]
+
+
+def test_lazy_imports():
+    # PyScaffold loads all the extensions in every `putup` call (e.g. `putup --help`),
+    # so modules that are only needed for specific operations should not be imported
+    code = "import sys, pyscaffoldext.markdown.extension; print(sorted(sys.modules))"
+    modules = check_output([sys.executable, "-c", code], universal_newlines=True)
+    assert "pyscaffoldext.markdown.conversion" not in modules
+
+
+def test_timing_events(monkeypatch):
+    events = []
+    monkeypatch.setattr(logger, "isEnabledFor", lambda _level: True)
+    monkeypatch.setattr(logger, "debug", events.append)
+    add_doc_requirements({}, {})
+    event = json.loads(events[-1])
+    assert event["extension"] == "markdown"
+    assert event["step"] == "add_doc_requirements"
+    assert event["seconds"] >= 0
@@ -0,0 +1,48 @@
+from pyscaffold import __version__ as pyscaffold_version
+from pyscaffold import api
+
+from pyscaffoldext.markdown.extension import MODIFIED, Markdown
+from pyscaffoldext.markdown.plan import plan
+
+
+def test_plan_new_project(tmpfolder):
+    changes = plan({"project_path": "proj"})
+    assert "README.md" in changes.added
+    assert "docs/index.md" in changes.added
+    # no file exists yet, so nothing is removed or modified
+    assert changes.removed == []
+    assert changes.modified == []
+    assert not (tmpfolder / "proj").exists()
+
+
+def test_plan_existing_project(tmpfolder):
+    # Given a project exists without the markdown extension, with extra doc pages
+    opts = dict(project_path="proj", version=pyscaffold_version)
+    api.create_project(opts, config_files=api.NO_CONFIG)
+    (tmpfolder / "proj/docs/guide.rst").write_text("Guide\n=====\n")
+    (tmpfolder / "proj/AUTHORS.md").write_text("# Authors\n")
+
+    # then existing files should not be overwritten, unless forced
+    changes = plan({**opts, "update": True, "markdown_docs": True})
+    assert "README.md" in changes.added
+    assert "docs/guide.md" in changes.added
+    assert "AUTHORS.md" not in changes.added
+    assert "README.rst" in changes.removed and "docs/index.rst" in changes.removed
+    # files created with `no_overwrite` are kept, but the extension is recorded
+    assert changes.modified == ["setup.cfg", "docs/conf.py"]
+
+    changes = plan({**opts, "update": True, "force": True})
+    assert "AUTHORS.md" in changes.added
+    assert "docs/guide.md" not in changes.added
+    assert set(changes.modified) == set(MODIFIED)
+
+    # and the plan should match the files actually changed by the extension
+    before = {path: (tmpfolder / "proj" / path).read_text() for path in MODIFIED}
+    opts = {**opts, "update": True, "extensions": [Markdown()]}
+    changes = plan(opts)
+    api.create_project(opts, config_files=api.NO_CONFIG)
+    after = {path: (tmpfolder / "proj" / path).read_text() for path in MODIFIED}
+    changed = [path for path in MODIFIED if after[path] != before[path]]
+    assert changes.modified == changed
+    # once the extension is recorded, setup.cfg is no longer changed on updates
+    assert plan(opts).modified == ["docs/conf.py"]
@@ -0,0 +1,52 @@
+from configparser import ConfigParser
+
+import pytest
+from pyscaffold import __version__ as pyscaffold_version
+from pyscaffold import api
+
+from pyscaffoldext.markdown.preview import preview
+from pyscaffoldext.markdown.validate import check_docs, check_readme
+
+
+def test_preview(tmpfolder, capsys):
+    files = preview(
+        project_path="proj",
+        package="pkg",
+        version=pyscaffold_version,
+        config_files=api.NO_CONFIG,
+    )
+    # No file should be written (or message printed)
+    assert not (tmpfolder / "proj").exists()
+    assert capsys.readouterr().out == ""
+
+    assert "# proj" in files["README.md"]
+    assert "README.rst" not in files
+    assert 'extensions.append("myst_parser")' in files["docs/conf.py"]
+    assert "file: README.md" in files["setup.cfg"]
+    assert "src/pkg/__init__.py" in files
+
+
+def test_generated_docs_are_valid(tmpfolder):
+    # Static replacement for a Sphinx build
+    opts = dict(version=pyscaffold_version, config_files=api.NO_CONFIG)
+    files = preview(project_path="proj", package="pkg", **opts)
+    docs = {path: content for path, content in files.items() if path.endswith(".md")}
+    assert len(docs) >= 10
+    assert check_docs(docs) == []
+
+
+def test_readme_renders_on_pypi(tmpfolder):
+    # In-process equivalent to `twine check` for the long description
+    markdown = pytest.importorskip("readme_renderer.markdown")
+    opts = dict(version=pyscaffold_version, config_files=api.NO_CONFIG)
+    files = preview(project_path="proj", package="pkg", **opts)
+
+    cfg = ConfigParser()
+    cfg.read_string(files["setup.cfg"])
+    assert cfg["metadata"]["long_description"] == "file: README.md"
+    content_type, *params = cfg["metadata"]["long_description_content_type"].split(";")
+    assert content_type == "text/markdown"
+    variant = dict(param.strip().split("=") for param in params)["variant"]
+
+    assert check_readme(files["README.md"], variant) == []
+    assert '<h1 id="user-content-proj">' in markdown.render(files["README.md"], variant)
@@ -0,0 +1,110 @@
+from textwrap import dedent
+
+import pytest
+
+from pyscaffoldext.markdown.conversion import rst_to_md
+from pyscaffoldext.markdown.validate import check_docs, check_readme
+
+
+def test_check_includes():
+    files = {
+        "README.md": "# Title\n",
+        "docs/readme.md": "```{include} ../README.md\n:relative-docs: docs/\n```\n",
+        "docs/other.md": "```{include} ../README.md\n```\n",
+        "docs/list.md": "1. Item\n\n   ```{include} missing.md\n   ```\n",
+        "docs/root.md": "```{include} /readme.md\n```\n",
+    }
+    assert check_docs(files) == [
+        "docs/readme.md: ../README.md included without :relative-docs: "
+        "or :relative-images:",
+        "docs/other.md: ../README.md included without :relative-docs: "
+        "or :relative-images:",
+        "docs/list.md: included file missing.md not found",
+    ]
+
+
+def test_check_toctree():
+    index = """\
+    ```{toctree}
+    :maxdepth: 2
+
+    Overview <readme>
+    existing
+    missing
+    api/modules
+    ```
+    """
+    files = {"docs/index.md": dedent(index), "docs/readme.md": "# Readme\n"}
+    assert check_docs(files, exists=lambda path: path == "docs/existing.rst") == [
+        "docs/index.md: toctree entry missing not found"
+    ]
+
+
+def test_check_headings_and_links():
+    page = """\
+    # Title
+
+    #Malformed
+
+    ### Skipped
+
+    See [git], [Some Site][site], [undefined] and [Other][missing].
+
+    - [x] done, [^note] and `[code]`
+
+    ```python
+    # [not a link]
+    ```
+
+    [git]: https://git-scm.com
+    [site]: https://example.com
+    """
+    assert check_docs({"page.md": dedent(page)}) == [
+        "page.md: malformed heading '#Malformed'",
+        "page.md: heading level skipped: '### Skipped'",
+        "page.md: undefined link [missing]",
+        "page.md: undefined link [undefined]",
+    ]
+
+
+def test_check_readme(monkeypatch):
+    markdown = pytest.importorskip("readme_renderer.markdown")
+    assert check_readme("# Title\n\nSee [git].\n\n[git]: https://git-scm.com\n") == []
+
+    # Converted READMEs can use syntax that is not supported by PyPI
+    rst = """\
+    Title
+    =====
+
+    Use :func:`f` and `git`_.
+
+    .. _label:
+
+    .. note:: Hi
+
+    .. This is a comment -->
+    """
+    readme = rst_to_md(dedent(rst)) + "-->\n"
+    calls = []
+    render = markdown.render
+
+    def _render(*args, **kwargs):
+        calls.append(args)
+        return render(*args, **kwargs)
+
+    monkeypatch.setattr(markdown, "render", _render)
+    expected = [
+        "README.md: MyST directive {note} is displayed as a code block",
+        "README.md: MyST role {func} is displayed verbatim",
+        "README.md: MyST target (label)= is displayed verbatim",
+        "README.md: undefined link [git]",
+        "README.md: unbalanced HTML comment (stray -->)",
+    ]
+    assert check_readme(readme) == expected
+    # results are cached by content
+    assert check_readme(readme) == expected
+    assert len(calls) == 1
+
+    # without the Markdown support of readme-renderer (``[md]``), nothing is reported
+    monkeypatch.setattr(markdown, "variants", {})
+    assert check_readme("# Not cached\n") == []